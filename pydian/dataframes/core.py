@@ -1,23 +1,42 @@
 import ast
+import operator
 import re
+from functools import lru_cache, reduce
 from typing import Any, Callable, Iterable, Literal
 
 import polars as pl
 from result import Err
 
 # `Bracket` is `[]`, `Braces` is `{}`
-COMMAS_IGNORING_BRACKETS_BRACES = r",(?![^{}\[\]]*[}\]])"
-COLONS_IGNORING_BRACES = r":(?![^{]*})"
-PERIOD_UP_TO_NEXT_CLOSE_PARENS = r"\.(.*?\))"
-STR_WITHIN_BRACKETS = r"\[([^\]]+)\]"
+PERIOD_UP_TO_NEXT_CLOSE_PARENS = re.compile(r"\.(.*?\))")
+STR_WITHIN_BRACKETS = re.compile(r"\[([^\]]+)\]")
+FIELD_WITH_OPTIONAL_INDEX = re.compile(r"([^.\[\]]+)(?:\[(-?\d+)\])?")  # e.g. `b`, `c[0]`, `c[-1]`
 
 FROM_KEYWORD = re.compile(r"\bFROM\b", re.IGNORECASE)
 ON_KEYWORD = re.compile(r"\bON\b", re.IGNORECASE)
-ON_COLS_PATTERN = r"\bon\s*\[(.*?)\]"  # TODO: refactor this at some point, it's a hack
+# TODO: refactor this at some point, it's a hack
+ON_COLS_PATTERN = re.compile(r"\bon\s*\[(.*?)\]", re.IGNORECASE)
 
 # Alright. Only support up to 26 tables max at a time. That's it. No exceptions! \s
 TABLE_ALIASES = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
 
+# `groupby` aggregation name -> Polars expression (built once, `pl.Expr` is immutable)
+# HACK: handle default the simple way
+GROUPBY_DEFAULT_AGG = "default"
+# NOTE: `coalesce` keeps the first non-null value. So we try the aggregation, however
+#       if it fails, then we take the `all` aggregation and keep original name to note unchanged
+GROUPBY_AGG_MAPPING: dict[str, pl.Expr] = {
+    GROUPBY_DEFAULT_AGG: pl.all(),
+    "all()": pl.all().name.suffix("_all"),  # If this is explicitly specified, then add the suffix
+    "len()": pl.all().len().name.suffix("_len"),
+    "n_unique()": pl.n_unique("*").name.suffix("_n_unique"),
+    "sum()": pl.all().sum().name.suffix("_sum"),
+    "mean()": pl.all().mean().name.suffix("_mean"),
+    "max()": pl.all().max().name.suffix("_max"),
+    "min()": pl.all().min().name.suffix("_min"),
+    "median()": pl.all().median().name.suffix("_median"),
+}
+
 
 def select(
     source: pl.DataFrame,
@@ -57,8 +76,10 @@ def select(
 
     # `from` logic (apply if applicable)
     # Identify if `join`, `union`, or `groupby` logic applies
-    if re.search(FROM_KEYWORD, key):
-        key, clause = re.split(FROM_KEYWORD, key, maxsplit=1)
+    #   (a single `split` both detects and splits on the keyword)
+    key_parts = FROM_KEYWORD.split(key, maxsplit=1)
+    if len(key_parts) == 2:
+        key, clause = key_parts
         # TODO: This only allows 1 operation per query, figure out how to do multiple
         if "++" in clause:
             source = _try_union(clause, source, others)  # type: ignore
@@ -73,31 +94,42 @@ def select(
             return source
 
     # Extract `:`-based query syntax from key (if present)
-    key = key.replace(" ", "")  # Remove whitespace
+    #   Columns and query are split (and whitespace dropped) in the same pass over the key
+    parsed_col_list, query_str = _split_key(key)
     query: pl.Expr | None = None
-    if re.search(COLONS_IGNORING_BRACES, key):
-        key, query_str = re.split(COLONS_IGNORING_BRACES, key, maxsplit=1)
-        query_str = query_str.strip("[]")
-        query = _convert_to_polars_filter(query_str)
-    ## Filter if the query is used
-    if isinstance(query, pl.Expr):
-        source = source.filter(query)
+    if query_str is not None:
+        query = _convert_to_polars_filter(query_str.strip("[]"))
+
+    # Identity entries (e.g. `{"a": "a"}`) are no-ops, so drop them (skips `rename` if none are left)
+    if isinstance(rename, dict):
+        rename = {k: v for k, v in rename.items() if k != v}
 
     # Main `query` logic (columns and ., ->)
     try:
-        # Grab correct subset/slice of the dataframe
-        parsed_col_list = re.split(
-            COMMAS_IGNORING_BRACKETS_BRACES, key
-        )  # Get distinct space for each column name
-        res = _apply_nested_col_list(source, parsed_col_list)
+        if parsed_col_list == ("*",) and query is None:
+            # Fast path: all columns and no filter, so there is no plan to build
+            #   (`clone` is O(1) and keeps in-place edits on the result from reaching `source`)
+            res = source.clone()
+        else:
+            ## Filter if the query is used
+            #   Done lazily so Polars can push the filter down together with the column projection
+            lf = source.lazy()
+            if isinstance(query, pl.Expr):
+                lf = lf.filter(query)
+            # Grab correct subset/slice of the dataframe
+            res = _apply_nested_col_list(lf, parsed_col_list).collect()
         # Post-processing checks
-        if res.is_empty():
+        if res.height == 0:
             raise pl.exceptions.ColumnNotFoundError
     except pl.exceptions.ColumnNotFoundError:
         return Err("<Default Err> `select` key didn't match anything (ColumnNotFoundError)")
 
     # TODO: Consider supporting regex search and pattern replacements (e.g. prefix_* -> new_prefix_*)
-    if rename and isinstance(res, pl.DataFrame):
+    #   Done on the collected result (metadata-only), so the schema isn't resolved a second time
+    if rename:
+        # Check against the selected columns so a bad `rename` isn't reported as a bad `key`
+        if isinstance(rename, dict) and (missing := rename.keys() - set(res.columns)):
+            return Err(f"`rename` keys not in the selected columns: {sorted(missing)}")
         res = res.rename(rename)
 
     return res
@@ -118,36 +150,34 @@ def _try_join(
         others = [others]  # type: ignore
     # join_alias_names = list(TABLE_ALIASES[:len(others) + 2])
     # HACK: Alright. Just do the join on one thing for now. Fix this with a CFG implementation.
-    if match := re.search(ON_COLS_PATTERN, join_clause, re.IGNORECASE):
+    if match := ON_COLS_PATTERN.search(join_clause):
         on = [col.strip() for col in match.group(1).split(",")]
     else:
         return Err("No join columns specified in brackets after 'on'")
 
     # Alright. Actually do the join
     second = others[0]
-    try:
-        # If _any_ of the provided indices aren't there, return `Err`
-        if isinstance(on, str):
-            on = [on]
-        for c in on:
-            if not (c in source.columns and c in second.columns):
-                raise KeyError(f"Proposed key {c} is not in either column!")
-    except KeyError as e:
-        return Err(f"Failed pre-merge checks for {how} join: {str(e)}")
+    # If _any_ of the provided indices aren't there, return `Err` (listing all of them)
+    #   `.columns` builds a new list on each access, so look it up once per frame
+    source_cols, second_cols = set(source.columns), set(second.columns)
+    missing_keys = [c for c in on if not (c in source_cols and c in second_cols)]
+    if missing_keys:
+        return Err(
+            f"Failed pre-merge checks for {how} join: Proposed keys {missing_keys} are not in both!"
+        )
 
     res = source.join(second, how=how, on=on, join_nulls=False, coalesce=True)  # type: ignore
+    h = res.height
 
     # NOTE: checking if left join didn't match anything (can't just do empty check bc it's outer join)
     if how == "left":
         # If there were no matches, then return `Err`
-        #  Check for non-null cols after the left-join
-        matched = True
-        for col_name in second.columns:
-            matched = matched and res.filter(pl.col(col_name).is_not_null()).height > 0
-        if not matched:
+        #  Check for non-null cols after the left-join (one pass over `res` for all columns)
+        null_counts = res.select([pl.col(c).null_count() for c in second.columns]).row(0)
+        if any(nc >= h for nc in null_counts):
             return Err("No matching columns on left join")
 
-    return res if not res.is_empty() else Err("Empty dataframe after join")
+    return res if h > 0 else Err("Empty dataframe after join")
 
 
 def _try_union(
@@ -166,18 +196,19 @@ def _try_union(
     # HACK: Going to revisit this with CFG parsing. For now, just assume it's just "A ++ B"
     rows = other
 
-    # Ensure all columns in `into` are present in `rows`
-    for col in source.columns:
-        if col not in rows.columns:
-            rows = rows.with_columns(pl.lit(na_default).alias(col))
-
-    # Ensure all columns in `rows` are present in `into`
-    for col in rows.columns:
-        if col not in source.columns:
-            source = source.with_columns(pl.lit(na_default).alias(col))
+    # Ensure all columns in `into` are present in `rows` (and vice-versa)
+    #   Missing columns are added in one `with_columns` call per side
+    source_cols, rows_cols = set(source.columns), set(rows.columns)
+    missing_in_rows = [col for col in source.columns if col not in rows_cols]
+    missing_in_source = [col for col in rows.columns if col not in source_cols]
+    if missing_in_rows:
+        rows = rows.with_columns([pl.lit(na_default).alias(col) for col in missing_in_rows])
+    if missing_in_source:
+        source = source.with_columns([pl.lit(na_default).alias(col) for col in missing_in_source])
 
     try:
-        res = pl.concat([source, rows])
+        # Align column order so the vertical concat lines up by name
+        res = pl.concat([source, rows.select(source.columns)])
     except Exception as e:
         return Err(f"Error when unioning: {str(e)}")
 
@@ -213,10 +244,8 @@ def _try_groupby(
     - `max()`, `min()`, `median()`
     """
     # NOTE: assumes only one input table, fix with CFG implementation...
-    # HACK: handle default the simple way
-    DEFAULT_STR = "default"
     # Parse `groupby_clause` str into halfs
-    bracket_str_list: list[str] = re.findall(STR_WITHIN_BRACKETS, groupby_clause)
+    bracket_str_list: list[str] = STR_WITHIN_BRACKETS.findall(groupby_clause)
     if not bracket_str_list:
         raise RuntimeError(f"Invalid structure for `groupby` clause: {groupby_clause}")
     bracket_str: str = bracket_str_list[0].replace(" ", "")
@@ -224,27 +253,12 @@ def _try_groupby(
         col_names, agg_names = bracket_str.split("|")
     else:
         # Default to `all()`
-        col_names, agg_names = bracket_str, DEFAULT_STR
+        col_names, agg_names = bracket_str, GROUPBY_DEFAULT_AGG
 
     # Organize appropriate aggregation function
     agg_list = agg_names.split(",")
-    # NOTE: `coalesce` keeps the first non-null value. So we try the aggregation, however
-    #       if it fails, then we take the `all` aggregation and keep original name to note unchanged
-    agg_mapping = {
-        DEFAULT_STR: pl.all(),
-        "all()": pl.all().name.suffix(
-            "_all"
-        ),  # If this is explicitly specified, then add the suffix
-        "len()": pl.all().len().name.suffix("_len"),
-        "n_unique()": pl.n_unique("*").name.suffix("_n_unique"),
-        "sum()": pl.all().sum().name.suffix("_sum"),
-        "mean()": pl.all().mean().name.suffix("_mean"),
-        "max()": pl.all().max().name.suffix("_max"),
-        "min()": pl.all().min().name.suffix("_min"),
-        "median()": pl.all().median().name.suffix("_median"),
-    }
     try:
-        mapped_agg_list = [agg_mapping[a] for a in agg_list]
+        mapped_agg_list = [GROUPBY_AGG_MAPPING[a] for a in agg_list]
     except KeyError as e:
         raise ValueError(
             f"Unsupported aggregation (if in polars, please open GitHub to suggest): {str(e)}"
@@ -254,59 +268,53 @@ def _try_groupby(
     col_list = col_names.split(",")
     res = source.group_by(col_list, maintain_order=keep_order).agg(mapped_agg_list)
 
-    if res.is_empty():
+    if res.height == 0:
         return Err("Dataframe after `group_by` is empty")
 
     return res
 
 
 class PythonExprToPolarsExprVisitor(ast.NodeVisitor):
+    # Python `and`/`or` -> single N-ary Polars expression (instead of N-1 binary `&`/`|`)
+    BOOL_OPS: dict[type[ast.boolop], Callable[[list[pl.Expr]], pl.Expr]] = {
+        ast.And: pl.all_horizontal,
+        ast.Or: pl.any_horizontal,
+    }
+    # Python operator node -> corresponding `pl.Expr` operator
+    CMP_OPS: dict[type[ast.cmpop], Callable[[Any, Any], Any]] = {
+        ast.Eq: operator.eq,
+        ast.Gt: operator.gt,
+        ast.Lt: operator.lt,
+        ast.GtE: operator.ge,
+        ast.LtE: operator.le,
+        ast.NotEq: operator.ne,
+    }
+    BIN_OPS: dict[type[ast.operator], Callable[[Any, Any], Any]] = {
+        ast.Add: operator.add,
+        ast.Sub: operator.sub,
+        ast.Mult: operator.mul,
+        ast.Div: operator.truediv,
+        ast.Mod: operator.mod,
+    }
+
     def visit_BoolOp(self, node):
-        if isinstance(node.op, ast.And):
-            expr = self.visit(node.values[0])
-            for value in node.values[1:]:
-                expr = expr & self.visit(value)
-        elif isinstance(node.op, ast.Or):
-            expr = self.visit(node.values[0])
-            for value in node.values[1:]:
-                expr = expr | self.visit(value)
-        return expr
+        return self.BOOL_OPS[type(node.op)]([self.visit(value) for value in node.values])
 
     def visit_Compare(self, node):
         left = self.visit(node.left)
-        comparisons = []
-        for op, comparator in zip(node.ops, node.comparators):
-            right = self.visit(comparator)
-            if isinstance(op, ast.Eq):
-                comparisons.append(left == right)
-            elif isinstance(op, ast.Gt):
-                comparisons.append(left > right)
-            elif isinstance(op, ast.Lt):
-                comparisons.append(left < right)
-            elif isinstance(op, ast.GtE):
-                comparisons.append(left >= right)
-            elif isinstance(op, ast.LtE):
-                comparisons.append(left <= right)
-            elif isinstance(op, ast.NotEq):
-                comparisons.append(left != right)
-        expr = comparisons[0]
-        for comparison in comparisons[1:]:
-            expr = expr & comparison
-        return expr
+        return reduce(
+            operator.and_,
+            (
+                self.CMP_OPS[type(op)](left, self.visit(comparator))
+                for op, comparator in zip(node.ops, node.comparators)
+            ),
+        )
 
     def visit_BinOp(self, node):
-        left = self.visit(node.left)
-        right = self.visit(node.right)
-        if isinstance(node.op, ast.Add):
-            return left + right
-        elif isinstance(node.op, ast.Sub):
-            return left - right
-        elif isinstance(node.op, ast.Mult):
-            return left * right
-        elif isinstance(node.op, ast.Div):
-            return left / right
-        elif isinstance(node.op, ast.Mod):
-            return left % right
+        op_fn = self.BIN_OPS.get(type(node.op))
+        if op_fn is None:
+            return None
+        return op_fn(self.visit(node.left), self.visit(node.right))
 
     def visit_Name(self, node):
         return pl.col(node.id)
@@ -314,34 +322,98 @@ class PythonExprToPolarsExprVisitor(ast.NodeVisitor):
     def visit_Constant(self, node):
         return pl.lit(node.value)
 
+    # Node type -> visitor method (looked up directly on `type(node)`)
+    NODE_VISITORS: dict[type[ast.AST], Callable[..., Any]] = {
+        ast.BoolOp: visit_BoolOp,
+        ast.Compare: visit_Compare,
+        ast.BinOp: visit_BinOp,
+        ast.Name: visit_Name,
+        ast.Constant: visit_Constant,
+    }
+
     def visit(self, node):
-        return super().visit(node)
+        # Skip `ast.NodeVisitor`'s `getattr(self, "visit_" + classname)` lookup on each node
+        visitor = self.NODE_VISITORS.get(type(node))
+        return visitor(self, node) if visitor else self.generic_visit(node)
 
 
+# The visitor holds no state, so a single instance is shared across calls
+_POLARS_EXPR_VISITOR = PythonExprToPolarsExprVisitor()
+
+
+@lru_cache(maxsize=512)
 def _convert_to_polars_filter(filter_string: str) -> pl.Expr:
+    """
+    Converts a Python expression string into a Polars expression.
+
+    Cached since the resulting `pl.Expr` is immutable and can be re-used across `select` calls
+    """
     tree = ast.parse(filter_string, mode="eval")
-    visitor = PythonExprToPolarsExprVisitor()
-    return visitor.visit(tree.body)
+    return _POLARS_EXPR_VISITOR.visit(tree.body)
+
+
+@lru_cache(maxsize=1024)
+def _split_key(key: str) -> tuple[tuple[str, ...], str | None]:
+    """
+    Splits `key` into its (whitespace-stripped) column strings and query string, e.g.:
+        `a, b.c, d -> [e, f] : [a > 3]` -> `(("a", "b.c", "d->[e,f]"), "[a>3]")`
+
+    Done in a single pass tracking bracket/brace depth: the first top-level `:` marks the
+      start of the query, and top-level `,` before it separate the columns
+      (i.e. `:` and `,` within brackets or braces are kept as part of the string).
+      Whitespace is skipped during the scan instead of stripping the key up-front.
+
+    Cached since the same `key` is typically re-used across many `select` calls
+    """
+    cols = []
+    curr: list[str] = []
+    depth = 0
+    for i, ch in enumerate(key):
+        if ch == " ":
+            continue
+        if ch in "[{":
+            depth += 1
+        elif ch in "]}":
+            depth -= 1
+        elif depth == 0:
+            if ch == ",":
+                cols.append("".join(curr))
+                curr.clear()
+                continue
+            elif ch == ":":
+                cols.append("".join(curr))
+                return tuple(cols), key[i + 1 :].replace(" ", "")
+        curr.append(ch)
+    cols.append("".join(curr))
+    return tuple(cols), None
 
 
 def _apply_nested_col_list(
-    source: pl.DataFrame,
-    parsed_col_list: list[str],
-) -> pl.DataFrame:
+    source: pl.LazyFrame,
+    parsed_col_list: tuple[str, ...],
+) -> pl.LazyFrame:
     """
     Completes handling of the `.`, `->` operators which is the `parsed_nested_col_list`.
       Converts the string expressions into corresponding Polars expression to apply at the end
     """
+    # Handle "*"-only case -- all columns, so no projection is needed
+    if parsed_col_list == ("*",):
+        return source
+    # Handle single plain column case (e.g. "col_name") -- no `.`, `->`, or `[]` to parse
+    if len(parsed_col_list) == 1 and parsed_col_list[0].isidentifier():
+        return source.select(parsed_col_list[0])
+
     # Handle `->` case
     parsed_nested_col_list = _generate_nesting_list(parsed_col_list)
 
-    # Handle "*" case -- replace each instance with `source.columns`
+    # Handle "*" case -- replace each instance with `source.columns` (in a single pass)
     if "*" in parsed_nested_col_list:
-        # Find indices of all occurrences of "*"
-        star_idx_list = [i for i, x in enumerate(parsed_nested_col_list) if x == "*"]
-        # Replace each "*" with the replacement values
-        for idx in reversed(star_idx_list):
-            parsed_nested_col_list[idx : idx + 1] = source.columns
+        all_cols = tuple(source.columns)
+        parsed_nested_col_list = tuple(
+            c
+            for col_str in parsed_nested_col_list
+            for c in (all_cols if col_str == "*" else (col_str,))
+        )
 
     # For each column specified, convert it to the corresponding Polars expression.
     #   Apply the expression at the end to get the final result
@@ -375,28 +447,28 @@ def _apply_nested_col_list(
     return res
 
 
+@lru_cache(maxsize=1024)
 def _colname_to_polars_expr(col_str: str, new_name: str | None = None) -> pl.Expr:
     """
     Converts something like:
         `a.b.c[0].d`
       into:
         `pl.col("a").struct.field("b").struct.field("c").list[0].struct.field("d")`
+
+    Cached since the resulting `pl.Expr` is immutable and can be re-used across `select` calls
     """
     nesting_list = col_str.split(".", maxsplit=1)
 
     res = pl.col(nesting_list[0])
 
-    # TODO: refactor this with regex
     if len(nesting_list) > 1:
-        for item in nesting_list[1].split("."):
-            # Handle brackets -- grab value (assume just integer for now)
-            list_idx: str | None = None
-            if "[" in item:
-                lbracket_idx = item.index("[")
-                list_idx = item[lbracket_idx + 1 : item.index("]")]
-                item = item[:lbracket_idx]  # Remove bracket from original str
+        for segment in nesting_list[1].split("."):
+            # Each segment is a field with an optional list index, e.g. `b` or `c[0]`
+            if not (match := FIELD_WITH_OPTIONAL_INDEX.fullmatch(segment)):
+                raise ValueError(f"Invalid nested column segment `{segment}` in: {col_str}")
+            item, list_idx = match.groups()
             res = res.struct.field(item)
-            if list_idx is not None:
+            if list_idx:
                 # TODO: Handle more than just single index, e.g. handle slices?
                 res = res.list[int(list_idx)]
 
@@ -408,9 +480,10 @@ def _colname_to_polars_expr(col_str: str, new_name: str | None = None) -> pl.Exp
     return res
 
 
+@lru_cache(maxsize=1024)
 def _generate_nesting_list(
-    parsed_col_list: list[str],
-) -> list[str | list[str] | dict[str, str]]:
+    parsed_col_list: tuple[str, ...],
+) -> tuple[str | list[str] | dict[str, str], ...]:
     """
     Return whether a specific column index should get nesting logic applied
 
@@ -425,14 +498,18 @@ def _generate_nesting_list(
     For each column, check if:
       1. Column should be extracted and consumed (`->`)
       2. Column should be nested into and consumed (any other str and supporting `.` syntax)
+
+    The result only depends on the key (not the DataFrame), so it is cached across `select` calls.
+      NOTE: callers should treat the returned value as read-only
     """
     parsed_nested_col_list: list[str | list[str] | dict[str, str]] = []
 
-    for col_name in parsed_col_list:
+    for col_str in parsed_col_list:
+        # Single scan for the operator (instead of an `in` check followed by `split`)
+        col_name, extract_op, content = col_str.partition("->")
         # 1. extract, and keep original
-        if "->" in col_name:
-            col_name, content = col_name.split("->")
-            col_obj = _extract_list(content, add_prefix=col_name)
+        if extract_op:
+            col_obj = _extract_list(content, add_prefix=col_name) if "->" not in content else None
             if col_obj:
                 parsed_nested_col_list.append(col_obj)
             else:
@@ -440,14 +517,15 @@ def _generate_nesting_list(
         # 2. regular string as-is (nested case handled implicitly)
         else:
             parsed_nested_col_list.append(col_name)
-    return parsed_nested_col_list
+    return tuple(parsed_nested_col_list)
 
 
 def _extract_list(s: str, add_prefix: str | None = None) -> list[str] | None:
     """
     Converts a string representation into a list[str].
-    Handles unwrapped strings in list format, e.g.:
+    Handles unwrapped (or quoted) strings in list format, e.g.:
         [a, b, c] -> ['a', 'b', 'c']
+        ['a', "b"] -> ['a', 'b']
 
     If `add_prefix` is specified, adds the prefix to each value:
         [a, b, c] with prefix "x" -> ['x.a', 'x.b', 'x.c']
@@ -459,7 +537,8 @@ def _extract_list(s: str, add_prefix: str | None = None) -> list[str] | None:
 
         # Extract and clean items
         content = s[1:-1]  # Remove outer brackets
-        items = [item.strip() for item in content.split(",") if item.strip()]  # Skip empty items
+        # Strip surrounding whitespace, then optional quotes (empty items are skipped)
+        items = [stripped for item in content.split(",") if (stripped := item.strip().strip("'\""))]
 
         # Add prefix if specified
         if add_prefix:
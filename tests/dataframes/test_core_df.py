@@ -18,6 +18,7 @@ def test_select(simple_dataframe: pl.DataFrame) -> None:
     assert_frame_equal(select(source, "a"), source[["a"]])  # type: ignore
     assert_frame_equal(source[["a", "b"]], select(source, "a, b"))  # type: ignore
     assert_frame_equal(select(source, "*"), source)  # type: ignore
+    assert select(source, "*") is not source  # Result is a new frame (in-place edits don't leak)
 
     assert isinstance(select(source, "non_existant_col"), Err)
 
@@ -34,6 +35,17 @@ def test_select(simple_dataframe: pl.DataFrame) -> None:
     assert_frame_equal(q2, source.filter(pl.col("a") % 2 == 0).select(["a", "b", "c"]))  # type: ignore
     assert isinstance(q3_err, Err)
 
+    # `rename` (applied at the end)
+    assert_frame_equal(select(source, "a", rename={"a": "y"}), source.select(pl.col("a").alias("y")))  # type: ignore
+    for k in ["a", "*", "a : [a > 0]"]:
+        rename_err = select(source, k, rename={"zz": "y"})
+        assert isinstance(rename_err, Err) and "rename" in rename_err.err_value
+
+    # Constant sub-expressions follow Polars semantics (not Python's)
+    assert_frame_equal(select(source, "a : [a < 1/0]"), source.select("a"))  # type: ignore
+    assert isinstance(select(source, "a : [a < 2 % 0]"), Err)  # null, so no rows match
+    assert isinstance(select(source, "a : [None == None]"), Err)  # null == null is null
+
 
 def test_nested_select(nested_dataframe: pl.DataFrame) -> None:
     # TODO: Refactor this test using the expected behavior
@@ -71,6 +83,26 @@ def test_nested_select(nested_dataframe: pl.DataFrame) -> None:
         multi_nesting_expected,
     )
 
+    # Negative list indexing counts from the end
+    last_dict_expected = source.select(
+        pl.col("deep_nesting")
+        .struct.field("patient")
+        .struct.field("dicts")
+        .list.last()
+        .alias("deep_nesting.patient.dicts[-1]")
+    )
+    select_last_dict = select(source, "deep_nesting.patient.dicts[-1]")
+    assert_frame_equal(select_last_dict, last_dict_expected)  # type: ignore
+
+    # Malformed list indexing raises (instead of silently selecting something else)
+    for bad_key in [
+        "deep_nesting.patient.dicts[]",
+        "deep_nesting.patient.dicts[0][1]",
+        "deep_nesting.patient.dicts[x]",
+    ]:
+        with pytest.raises(ValueError):
+            select(source, bad_key)
+
     # Extend, and consume source col (->)
     extend_expected = source.select(
         pl.col("simple_nesting")
@@ -84,6 +116,12 @@ def test_nested_select(nested_dataframe: pl.DataFrame) -> None:
     )
     select_extend = select(source, "simple_nesting -> [patient.id, patient.active]")
     assert_frame_equal(select_extend, extend_expected)  # type: ignore
+    select_extend_quoted = select(source, "simple_nesting -> ['patient.id', \"patient.active\"]")
+    assert_frame_equal(select_extend_quoted, extend_expected)  # type: ignore
+    select_extend_multiline = select(
+        source, "simple_nesting -> [\n  patient.id,\tpatient.active\n]"
+    )
+    assert_frame_equal(select_extend_multiline, extend_expected)  # type: ignore
 
 
 def test_left_join(simple_dataframe: pl.DataFrame) -> None:
@@ -115,6 +153,10 @@ def test_left_join(simple_dataframe: pl.DataFrame) -> None:
     assert isinstance(
         select(source, "* from A <- B on [a, e]", others=df_right), Err
     ), "Expected Err since `e` is not in left"
+    # All missing keys are reported at once
+    missing_keys_err = select(source, "* from A <- B on [a, e, f]", others=df_right)
+    assert isinstance(missing_keys_err, Err)
+    assert "'e'" in missing_keys_err.err_value and "'f'" in missing_keys_err.err_value
 
     # Basic join
     expected = deepcopy(source)
@@ -185,6 +227,11 @@ def test_union(simple_dataframe: pl.DataFrame) -> None:
     result = select(simple_dataframe, "* from A ++ B", others=rows_to_union_default)
     pl.DataFrame(expected_data_default).equals(result)  # type: ignore
 
+    # Test same columns in a different order (aligned by name)
+    reordered_rows_to_union = pl.DataFrame({"d": [None], "c": [False], "b": ["u"], "a": [6]})
+    result = select(simple_dataframe, "* from A ++ B", others=reordered_rows_to_union)
+    assert_frame_equal(result, pl.DataFrame(expected_data))  # type: ignore
+
     # Test incompatible columns
     incompatible_rows = pl.DataFrame(
         {"e": [8]}